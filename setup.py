@@ -16,4 +16,7 @@ setuptools.setup(
         ]
     },
     install_requires=[],
+    extras_require={
+        "fast": ["h5py", "numba", "diskcache"],
+    },
 )
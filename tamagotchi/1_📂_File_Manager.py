@@ -29,9 +29,13 @@ class BytesStreamManager:
 
     def __iter__(self):
         text_stream = TextIOWrapper(self.bytestream, encoding="utf-8")
-        for line in text_stream:
-            yield line
-        text_stream.detach()
+        try:
+            for line in text_stream:
+                yield line
+        finally:
+            # Detaching also when the loop is left early keeps the wrapper from closing
+            # the stream once it is garbage collected
+            text_stream.detach()
 
     def __iadd__(self, obj: BytesStreamManager) -> BytesStreamManager:
         lines: List[str] = []
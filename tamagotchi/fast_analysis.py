@@ -0,0 +1,283 @@
+############################################################################################
+# # # # # # # # # # # # # # # # #     FAST ANALYSIS      # # # # # # # # # # # # # # # # # #
+############################################################################################
+
+# Drop-in replacements of MDAnalysis analysis classes with faster per-frame kernels. They
+# live outside of the pages so that they can be pickled by the multiprocessing backend.
+
+import numpy as np
+import scipy.fft
+from MDAnalysis.analysis.lineardensity import LinearDensity
+from MDAnalysis.analysis.msd import EinsteinMSD
+from MDAnalysis.units import constants, convert
+from MDAnalysis.analysis.rdf import InterRDF
+from MDAnalysis.lib.distances import capped_distance, distance_array
+
+
+def bin_indices(values, edges):
+    """Bins of `values` over the equally spaced `edges`, as assigned by `np.histogram`.
+
+    Returns the mask of the values within the edges and the bin index of each of them.
+    """
+
+    lo, hi = edges[0], edges[-1]
+    nbins = len(edges) - 1
+
+    inside = (values >= lo) & (values <= hi)
+    values = values[inside]
+
+    idx = ((values - lo) * (nbins / (hi - lo))).astype(np.intp)
+    idx[idx == nbins] -= 1
+
+    # Values lying on a bin edge may be misplaced by the rounding above
+    idx[values < edges[idx]] -= 1
+    idx[(values >= edges[idx + 1]) & (idx != nbins - 1)] += 1
+
+    return inside, idx
+
+
+def linear_bincount(values, edges, weights=None):
+    """Histogram of `values` over the equally spaced `edges`.
+
+    Gives the same result of `np.histogram(values, bins=len(edges) - 1, range=(edges[0],
+    edges[-1]))`, edge cases included, with a single `np.bincount` over the bin indices.
+    """
+
+    inside, idx = bin_indices(values, edges)
+    if weights is not None:
+        weights = weights[inside]
+
+    return np.bincount(idx, weights=weights, minlength=len(edges) - 1)
+
+
+class FastInterRDF(InterRDF):
+    """InterRDF with a selectable distance search method and backend.
+
+    By default the pairs within the RDF range are found with the neighbour grid of
+    `capped_distance` ("nsgrid"), so memory grows with the number of close pairs rather
+    than with the product of the group sizes. With `method="bruteforce"` the whole
+    distance matrix is computed by `distance_array` using `backend` ("OpenMP" by default,
+    threads set by OMP_NUM_THREADS), since only recent MDAnalysis versions let
+    `capped_distance` forward a backend to its brute-force search.
+    """
+
+    def __init__(self, g1, g2, method="nsgrid", backend="OpenMP", **kwargs):
+        super().__init__(g1, g2, **kwargs)
+        self._method = method
+        self._backend = backend
+
+    def _pair_distances(self):
+
+        lo, hi = self.rdf_settings["range"]
+
+        if self._method == "bruteforce":
+            dist = distance_array(
+                self.g1.positions,
+                self.g2.positions,
+                box=self._ts.dimensions,
+                backend=self._backend,
+            )
+            pairs = np.argwhere((dist >= lo) & (dist <= hi))
+            return pairs, dist[pairs[:, 0], pairs[:, 1]]
+
+        # capped_distance excludes min_cutoff itself, while the histogram includes it
+        return capped_distance(
+            self.g1.positions,
+            self.g2.positions,
+            max_cutoff=hi,
+            min_cutoff=np.nextafter(lo, -np.inf),
+            box=self._ts.dimensions,
+            method=self._method,
+            return_distances=True,
+        )
+
+    def _single_frame(self):
+
+        pairs, dist = self._pair_distances()
+
+        # Maybe exclude same molecule distances
+        if self._exclusion_block is not None:
+            idxA = pairs[:, 0] // self._exclusion_block[0]
+            idxB = pairs[:, 1] // self._exclusion_block[1]
+            dist = dist[idxA != idxB]
+
+        # Ignore distances between atoms in the same residue, segment or chain
+        if getattr(self, "exclude_same", None) is not None:
+            attr_ix_a = getattr(self.g1, self.exclude_same)[pairs[:, 0]]
+            attr_ix_b = getattr(self.g2, self.exclude_same)[pairs[:, 1]]
+            dist = dist[attr_ix_a != attr_ix_b]
+
+        self.results.count += linear_bincount(dist, self.results.edges)
+
+        if self.norm == "rdf":
+            # Parallelizable versions of InterRDF keep the cumulated volume in the results
+            if "volume_cum" in self.results:
+                self.results.volume_cum += self._ts.volume
+            else:
+                self.volume_cum += self._ts.volume
+
+    def _get_aggregator(self):
+        # Only reached by the parallel backends of MDAnalysis >= 2.8
+        from MDAnalysis.analysis.results import ResultsGroup
+
+        # InterRDF sums the bin centres of the workers together with the counts
+        return ResultsGroup(
+            lookup={
+                "count": ResultsGroup.ndarray_sum,
+                "volume_cum": ResultsGroup.ndarray_sum,
+                "bins": ResultsGroup.ndarray_mean,
+                "edges": ResultsGroup.ndarray_mean,
+            }
+        )
+
+
+class FastEinsteinMSD(EinsteinMSD):
+    """EinsteinMSD with a vectorized FFT algorithm.
+
+    The positions are stored in single precision and the fast correlation algorithm of
+    tidynamics is applied to chunks of particles at once with `scipy.fft`, using all the
+    available threads. Each particle is centred on its average position before the
+    transform to limit the loss of precision, since the MSD does not depend on it.
+    """
+
+    # Particles transformed at once, bounds the memory used by the FFT
+    chunk_size = 256
+
+    def _prepare(self):
+        self.results.msds_by_particle = np.zeros(
+            (self.n_frames, self.n_particles), dtype=np.float32
+        )
+        self._position_array = np.zeros(
+            (self.n_frames, self.n_particles, self.dim_fac), dtype=np.float32
+        )
+
+    def _conclude_fft(self):
+
+        n_frames = self.n_frames
+        # Number of frames entering the average of each lag time
+        counts = np.arange(n_frames, 0, -1)[:, np.newaxis]
+
+        for start in range(0, self.n_particles, self.chunk_size):
+            positions = self._position_array[:, start : start + self.chunk_size]
+            positions = positions - positions.mean(axis=0)
+
+            # S1: average of r^2(k) + r^2(k + m), from the cumulative sums of r^2
+            square = np.square(positions, dtype=np.float64).sum(axis=2)
+            cumsum = np.zeros((n_frames + 1, square.shape[1]))
+            np.cumsum(square, axis=0, out=cumsum[1:])
+            S1 = cumsum[n_frames:0:-1] + cumsum[-1] - cumsum[:n_frames]
+
+            # S2: average of r(k) * r(k + m), from the zero padded autocorrelation
+            F = scipy.fft.rfft(positions, n=2 * n_frames, axis=0, workers=-1)
+            S2 = scipy.fft.irfft(F * F.conj(), axis=0, workers=-1)[:n_frames].sum(axis=2)
+
+            self.results.msds_by_particle[:, start : start + self.chunk_size] = (
+                S1 - 2 * S2
+            ) / counts
+
+        self.results.timeseries = self.results.msds_by_particle.mean(
+            axis=1, dtype=np.float64
+        )
+        self.results.delta_t_values = np.arange(self.n_frames) * (
+            self.times[1] - self.times[0]
+        )
+
+
+class FastLinearDensity(LinearDensity):
+    """LinearDensity binning each axis only once.
+
+    With `grouping="atoms"` the bin of every atom along each axis is computed a single
+    time and shared by the mass and charge histograms, which are then obtained with
+    `np.bincount`. The other groupings are left to LinearDensity.
+    """
+
+    def _single_frame(self):
+
+        if self.grouping != "atoms":
+            return super()._single_frame()
+
+        ag = self._ags[0]
+        self.masses = ag.masses
+        self.charges = ag.charges
+        self.group = ag.atoms
+
+        ag.wrap(compound="atoms")
+        positions = ag.positions
+
+        edges = np.linspace(0.0, max(self.dimensions), self.nbins + 1)
+
+        for dim in ["x", "y", "z"]:
+            results = self.results[dim]
+            inside, idx = bin_indices(positions[:, results["dim"]], edges)
+
+            for key, weights in [("mass", self.masses), ("charge", self.charges)]:
+                hist = np.bincount(idx, weights=weights[inside], minlength=self.nbins)
+                results[f"{key}_density"] += hist
+                results[f"{key}_density_stddev"] += np.square(hist)
+
+            results["hist_bin_edges"] = edges
+
+
+def dielectric_constant(atomgroup, coordinates, dimensions, temperature):
+    """Average dielectric constant from the total dipole fluctuations of a trajectory.
+
+    Same result of `DielectricConstant(atomgroup, ...).results.eps_mean`, with `coordinates`
+    the (n_frames, n_atoms, 3) positions of the whole molecules of `atomgroup` and
+    `dimensions` the (n_frames, 6) orthorhombic boxes. The dipoles of all the frames are
+    obtained with a single product.
+    """
+
+    # Moving a charged molecule by a box vector would change the total dipole
+    if not np.allclose(atomgroup.total_charge(compound="fragments"), 0.0, atol=1e-5):
+        raise NotImplementedError(
+            "Analysis for non-neutral systems or systems with free charges are not available."
+        )
+
+    # Gathering the atoms copies the whole trajectory, only done for actual subsets
+    if len(atomgroup) != coordinates.shape[1]:
+        coordinates = coordinates[:, atomgroup.indices]
+
+    # A stacked product over the frames, which unlike einsum does not copy the coordinates
+    charges = atomgroup.charges.astype(coordinates.dtype)
+    M = np.matmul(charges, coordinates).astype(np.float64)
+
+    fluct = (M * M).mean(axis=0) - M.mean(axis=0) ** 2
+    volume = np.prod(dimensions[:, :3], axis=1, dtype=np.float64).mean()
+
+    eps = fluct / (
+        convert(constants["Boltzmann_constant"], "kJ/mol", "eV")
+        * temperature
+        * volume
+        * constants["electric_constant"]
+    )
+
+    return eps.mean() + 1
+
+
+def run_together(analyses, step=None):
+    """Runs several analyses of the same trajectory reading each frame only once"""
+
+    trajectory = analyses[0]._trajectory
+    if any(analysis._trajectory is not trajectory for analysis in analyses):
+        raise ValueError("All the analyses must belong to the same trajectory")
+
+    for analysis in analyses:
+        analysis._setup_frames(trajectory, step=step)
+        analysis._prepare()
+
+    for idx, ts in enumerate(trajectory[::step]):
+        positions = ts.positions.copy()
+        for analysis in analyses:
+            analysis._frame_index = idx
+            analysis._ts = ts
+            analysis.frames[idx] = ts.frame
+            analysis.times[idx] = ts.time
+            analysis._single_frame()
+            # Some analyses move the atoms in place (make_whole, wrap) and must not
+            # affect the ones that follow
+            ts.positions = positions
+
+    for analysis in analyses:
+        analysis._conclude()
+
+    return analyses
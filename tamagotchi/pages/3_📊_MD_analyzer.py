@@ -4,15 +4,39 @@
 
 import MDAnalysis as mda
 from MDAnalysis import transformations as trans
-from MDAnalysis.analysis.rdf import InterRDF
-from io import StringIO
+from MDAnalysis.analysis.dielectric import DielectricConstant
+from MDAnalysis.coordinates.H5MD import HAS_H5PY
+from MDAnalysis.coordinates.memory import MemoryReader
+from pathlib import Path
+
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
 
 import pandas as pd
 import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from tempfile import NamedTemporaryFile as tmp
+from scipy.stats import linregress
+
+from fast_analysis import (
+    FastEinsteinMSD,
+    FastInterRDF,
+    FastLinearDensity,
+    dielectric_constant,
+    run_together,
+)
+from rdf_kernel import RDF_BACKEND, self_rdf
+
+try:
+    import diskcache
+
+    HAS_DISKCACHE = True
+except ImportError:
+    HAS_DISKCACHE = False
 
 st.set_page_config(
     layout="wide",
@@ -20,217 +44,546 @@ st.set_page_config(
 
 ss = st.session_state
 
-xyz_options = [item for item in ss.XYZs]
-xyz_options.sort(key=lambda x: x.name)
-xyz_file = st.sidebar.selectbox(
-    "Select trajectory file", xyz_options, format_func=lambda x: x.name
-)
+# The selectboxes pick indices: widget values are deep copies, which would duplicate the
+# uploaded files on every rerun
+xyz_options = sorted(ss.XYZs, key=lambda x: x.name)
+xyz_file = xyz_options[
+    st.sidebar.selectbox(
+        "Select trajectory file",
+        range(len(xyz_options)),
+        format_func=lambda i: xyz_options[i].name,
+    )
+]
+
+topo_options = sorted(ss.MOL2s, key=lambda x: x.name)
+topo_file = topo_options[
+    st.sidebar.selectbox(
+        "Select topology file",
+        range(len(topo_options)),
+        format_func=lambda i: topo_options[i].name,
+    )
+]
+
+pbc_options = sorted(ss.PBCs, key=lambda x: x.name)
+pbc_file = pbc_options[
+    st.sidebar.selectbox(
+        "Select pbc file",
+        range(len(pbc_options)),
+        format_func=lambda i: pbc_options[i].name,
+    )
+]
 
-topo_options = [item for item in ss.MOL2s]
-topo_options.sort(key=lambda x: x.name)
-topo_file = st.sidebar.selectbox(
-    "Select topology file", topo_options, format_func=lambda x: x.name
-)
+CACHE_DIR = Path(tempfile.gettempdir()) / "tamagotchi"
 
-pbc_options = [item for item in ss.PBCs]
-pbc_options.sort(key=lambda x: x.name)
-pbc_file = st.sidebar.selectbox(
-    "Select pbc file", pbc_options, format_func=lambda x: x.name
-)
+
+# Paths of the uploads already saved, so that reruns do not hash the same bytes again.
+# Merging files replaces their stream, which then gets a new entry
+if "saved_paths" not in ss:
+    ss.saved_paths = weakref.WeakKeyDictionary()
+
+
+def save_to_disk(file, suffix):
+    """Writes an uploaded file to a path derived from its content and returns it"""
+
+    stream = file.bytestream
+    if stream in ss.saved_paths and os.path.exists(ss.saved_paths[stream]):
+        return ss.saved_paths[stream]
+
+    data = stream.getvalue()
+    path = CACHE_DIR / f"{hashlib.md5(data).hexdigest()}{suffix}"
+
+    if not path.exists():
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        partial.write_bytes(data)
+        partial.replace(path)
+
+    ss.saved_paths[stream] = str(path)
+    return str(path)
 
 
-with tmp(mode="w+") as topo_tmp, tmp(mode="w+") as xyz_tmp:
-    topo_tmp.write(StringIO(topo_file.bytestream.getvalue().decode("utf-8")).read())
-    xyz_tmp.write(StringIO(xyz_file.bytestream.getvalue().decode("utf-8")).read())
+@st.cache_data(show_spinner=False)
+def read_pbc(path: str) -> float:
+    """Reads the side of the cubic box from a pbc file"""
 
-    for line in topo_file:
-        if "UNL" in line:
-            ss.resname = line.split()[-2]
-            break
-        ss.resname = "UNL"
+    return float(Path(path).read_text().strip())
 
-    ss.box_side = float(pbc_file.bytestream.read())
 
-    def create_u():
+topo_path = save_to_disk(topo_file, ".mol2")
+xyz_path = save_to_disk(xyz_file, ".xyz")
+pbc_path = save_to_disk(pbc_file, ".pbc")
 
-        u = mda.Universe(topo_tmp.name, xyz_tmp.name, format="XYZ", topology_format="MOL2")
-        u.dimensions = [ss.box_side, ss.box_side, ss.box_side, 90, 90, 90]
+for line in topo_file:
+    if "UNL" in line:
+        ss.resname = line.split()[-2]
+        break
+    ss.resname = "UNL"
 
-        return u
+ss.box_side = read_pbc(pbc_path)
 
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(
-        [
-            "O-O RDF",
-            "Linear Density",
-            "Self-Diffusivity",
-            "Dielectric Constant",
-            "Solute-solvent RDF",
-        ]
+
+# Trajectories up to this size (in bytes of XYZ text) are loaded in memory, where they
+# take roughly a third of the space. The raw and the wrapped trajectories are held as two
+# separate copies, so together they take about 700 MB at most
+IN_MEMORY_MAX_SIZE = 1024**3
+
+# Trajectories kept by the caches of the Universes at the same time
+MAX_CACHED_TRAJECTORIES = 2
+
+in_memory = os.path.getsize(xyz_path) <= IN_MEMORY_MAX_SIZE
+if not in_memory:
+    st.sidebar.warning(
+        "The trajectory is too large to be loaded in memory and will be read from disk"
     )
 
-    with tab1:
 
-        # O-O Radial Distribution Function (RDF)
+@st.cache_resource(
+    show_spinner="Converting the trajectory to H5MD…", max_entries=MAX_CACHED_TRAJECTORIES
+)
+def to_h5md(xyz_path, box_side):
+
+    # The binary copy, box included, is kept next to the XYZ file and is reused after
+    # a restart
+    h5md_path = f"{os.path.splitext(xyz_path)[0]}_{box_side}.h5md"
+
+    if not os.path.exists(h5md_path):
+        u = mda.Universe(xyz_path, format="XYZ")
+        u.dimensions = [box_side, box_side, box_side, 90, 90, 90]
+        partial = f"{h5md_path}.part"
+
+        writer = mda.Writer(partial, n_atoms=u.atoms.n_atoms, format="H5MD")
+        for ts in u.trajectory:
+            writer.write(u.atoms)
+        # H5MDWriter does not close the file by itself
+        writer.h5md_file.close()
+
+        os.replace(partial, h5md_path)
 
-        u = create_u()
+    return h5md_path
 
-        water = u.select_atoms(f"not resname {ss.resname}")
 
-        workflow = [
-            trans.unwrap(u.atoms),
-            trans.wrap(water, compound="residues"),
-        ]
+@st.cache_resource(show_spinner=False, max_entries=MAX_CACHED_TRAJECTORIES)
+def create_u(topo_path, xyz_path, pbc_path, in_memory):
+
+    box_side = read_pbc(pbc_path)
+
+    if HAS_H5PY:
+        # The "core" driver reads the whole file at once when it is going in memory
+        u = mda.Universe(
+            topo_path,
+            to_h5md(xyz_path, box_side),
+            format="H5MD",
+            topology_format="MOL2",
+            driver="core" if in_memory else None,
+        )
+    else:
+        u = mda.Universe(topo_path, xyz_path, format="XYZ", topology_format="MOL2")
+        # The XYZ reader keeps the box of the current frame for the whole trajectory
+        u.dimensions = [box_side, box_side, box_side, 90, 90, 90]
+
+    if in_memory:
+        u.transfer_to_memory(step=1)
+
+    return u
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_CACHED_TRAJECTORIES)
+def _with_wrap_unwrap(topo_path, xyz_path, pbc_path, resname, in_memory):
+
+    # The transformations are attached to a copy so that the analyses working on the
+    # raw trajectory (linear density, MSD, dielectric constant) are not affected
+    raw = create_u(topo_path, xyz_path, pbc_path, in_memory)
+    u = raw.copy()
+    u.dimensions = raw.dimensions
+
+    water = u.select_atoms(f"not resname {resname}")
+
+    workflow = [
+        trans.unwrap(u.atoms),
+        trans.wrap(water, compound="residues"),
+    ]
+
+    if in_memory:
+        # The transformed coordinates are written back once and for all instead of being
+        # recomputed every time a frame is accessed
+        coordinates = u.trajectory.coordinate_array
+        for ts in u.trajectory:
+            for transform in workflow:
+                ts = transform(ts)
+            coordinates[ts.frame] = ts.positions
+    else:
         u.trajectory.add_transformations(*workflow)
 
-        rdf = InterRDF(
-            u.select_atoms(f"name O"),
-            u.select_atoms(f"name O"),
+    return u
+
+
+@st.cache_resource(show_spinner=False)
+def universe_lock(topo_path, xyz_path, pbc_path, in_memory):
+    """Lock serializing the sweeps of the Universes that sessions share for these files"""
+
+    return threading.Lock()
+
+
+def run_parallel(analysis, **kwargs):
+    """Runs an analysis splitting the frames over all the available cores"""
+
+    # Only MDAnalysis >= 2.8 has backends, and only some analyses can be split over frames
+    parallel = getattr(analysis, "parallelizable", False) and (
+        "multiprocessing" in analysis.get_supported_backends()
+    )
+
+    # Workers reopen trajectories read from disk, while in-memory ones would be pickled
+    # whole into every one of them
+    if not parallel or isinstance(analysis._trajectory, MemoryReader):
+        # The serial run goes through run_together, which leaves the cached coordinates
+        # untouched
+        return run_together([analysis], **kwargs)[0]
+
+    return analysis.run(backend="multiprocessing", n_workers=os.cpu_count(), **kwargs)
+
+
+def run_analyses(topo_path, xyz_path, pbc_path, resname, in_memory, enabled):
+
+    # The cached Universes are shared by all the sessions: two sweeps running at the same
+    # time would move the same frame pointers and restore each other's positions
+    with universe_lock(topo_path, xyz_path, pbc_path, in_memory):
+        return _run_analyses(topo_path, xyz_path, pbc_path, resname, in_memory, enabled)
+
+
+def _run_analyses(topo_path, xyz_path, pbc_path, resname, in_memory, enabled):
+
+    raw = create_u(topo_path, xyz_path, pbc_path, in_memory)
+    wrapped = _with_wrap_unwrap(topo_path, xyz_path, pbc_path, resname, in_memory)
+
+    box_side = raw.dimensions[0]
+
+    # Analyses sharing a trajectory are run over a single sweep of its frames
+    raw_analyses = {}
+    wrapped_analyses = {}
+    results = {}
+
+    if "rdf_OO" in enabled and in_memory and RDF_BACKEND == "numba":
+        # Minimum image distances do not need the wrapped coordinates
+        oxygens = raw.select_atoms("name O")
+        results["rdf_OO"] = self_rdf(
+            raw.trajectory.coordinate_array[:, oxygens.indices],
+            raw.trajectory.dimensions_array,
+            nbins=500,
+            range=(2.0, box_side / 2),
+        )
+    elif "rdf_OO" in enabled:
+        oxygens = wrapped.select_atoms("name O")
+        wrapped_analyses["rdf_OO"] = FastInterRDF(
+            oxygens,
+            oxygens,
             nbins=500,
-            range=([2.0, ss.box_side / 2]),
+            range=(2.0, box_side / 2),
             exclusion_block=(1, 1),
         )
 
-        if "rdf_OO" not in st.session_state:
-            st.session_state["rdf_OO"] = None
-        if st.button("Calculate O-O RDF"):
-            st.session_state["rdf_OO"] = rdf.run(step=1)
-            rdf_OO = st.session_state["rdf_OO"]
+    if "rdf_solute_solvent" in enabled:
+        wrapped_analyses["rdf_solute_solvent"] = FastInterRDF(
+            wrapped.select_atoms(f"resname {resname}"),
+            wrapped.select_atoms(f"not resname {resname}"),
+            nbins=500,
+            range=(1.0, box_side / 2),
+        )
+
+    if "ldens" in enabled:
+        raw_analyses["ldens"] = FastLinearDensity(raw.atoms, binsize=0.1)
 
-            fig_rdf = go.Figure()
+    if "msd" in enabled:
+        raw_analyses["msd"] = FastEinsteinMSD(raw, select="all", msd_type="xyz", fft=True)
 
-            import os
+    if "diel" in enabled and in_memory:
+        # The molecules of the wrapped trajectory are already whole, and moving a neutral
+        # molecule by a box vector leaves the total dipole unchanged
+        results["diel"] = dielectric_constant(
+            wrapped.atoms,
+            wrapped.trajectory.coordinate_array,
+            wrapped.trajectory.dimensions_array,
+            temperature=298.15,
+        )
+    elif "diel" in enabled:
+        raw_analyses["diel"] = DielectricConstant(
+            raw.atoms, temperature=298.15, make_whole=True
+        )
 
-            exp_path = f"{os.path.dirname(__file__)}/../data/RDF_OO_exp.csv"
+    for analyses in [wrapped_analyses, raw_analyses]:
+        if len(analyses) == 1:
+            run_parallel(*analyses.values(), step=1)
+        elif len(analyses) > 1:
+            run_together(list(analyses.values()), step=1)
+
+    analyses = {**wrapped_analyses, **raw_analyses}
+
+    for name in ["rdf_OO", "rdf_solute_solvent"]:
+        if name in analyses:
+            results[name] = analyses[name].results.bins, analyses[name].results.rdf
+
+    if "ldens" in analyses:
+        ldens = analyses["ldens"]
+        results["ldens"] = (
+            ldens.results.x.hist_bin_edges,
+            ldens.results.x.mass_density,
+            ldens.results.y.mass_density,
+            ldens.results.z.mass_density,
+        )
 
-            exp = pd.read_csv(exp_path)
+    if "msd" in analyses:
+        MSD = analyses["msd"]
+        msd_hash = hashlib.md5(MSD.results.timeseries.tobytes()).hexdigest()
+        results["msd"] = MSD.results.timeseries, MSD.n_frames, MSD.dim_fac, msd_hash
 
-            fig_rdf.add_trace(
-                go.Scatter(
-                    x=exp["r (Å)"],
-                    y=exp["g_OO"],
-                    name="Experimental",
-                ),
-            )
+    if "diel" in analyses:
+        results["diel"] = analyses["diel"].results.eps_mean
 
-            fig_rdf.add_trace(
-                go.Scatter(
-                    x=rdf_OO.results.bins,
-                    y=rdf_OO.results.rdf,
-                    name="Calculated",
-                ),
-            )
+    return results
 
-            fig_rdf.update_xaxes(title_text="r (Å)")
-            fig_rdf.update_yaxes(title_text="g(r) O-O")
 
-            st.plotly_chart(fig_rdf, use_container_width=True)
+# Part of the keys of the cached results, to be bumped whenever an analysis changes so that
+# the results stored on disk by previous versions are not served anymore
+RESULTS_VERSION = 1
 
-    with tab2:
 
-        # Linear Density
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_result(key, _result=None):
+    """In-process cache of the result of each analysis, with the keys of the disk cache.
 
-        u = create_u()
+    Called with `_result` it stores it, without it looks the key up and raises KeyError if
+    it is missing, since st.cache_data does not cache exceptions.
+    """
 
-        from MDAnalysis.analysis.lineardensity import LinearDensity
+    if _result is None:
+        raise KeyError(key)
+    return _result
 
-        ldens = LinearDensity(u.atoms, binsize=0.1)
 
-        if "ldens" not in st.session_state:
-            st.session_state["ldens"] = None
-        if st.button("Calculate Linear Density"):
-            st.session_state["ldens"] = ldens.run()
-            ldens = st.session_state["ldens"]
+def compute_analyses(topo_path, xyz_path, pbc_path, resname, in_memory, enabled):
 
-            fig_ldens = go.Figure()
-            average = (
-                ldens.results.x.mass_density
-                + ldens.results.y.mass_density
-                + ldens.results.z.mass_density
-            ) / 3
+    # The saved files are named after their content, so the results of previous runs of
+    # the app can be found on disk from the file names alone
+    fingerprint = tuple(Path(path).name for path in [topo_path, xyz_path, pbc_path])
+    keys = {name: (RESULTS_VERSION, name, *fingerprint, resname) for name in enabled}
 
-            fig_ldens.add_trace(
-                go.Scatter(
-                    x=ldens.results.x.hist_bin_edges,
-                    y=ldens.results.x.mass_density,
-                    name="X",
-                    line={
-                        "width": 0.5,
-                        "color": "red",
-                    },
-                ),
-            )
-            fig_ldens.add_trace(
-                go.Scatter(
-                    x=ldens.results.y.hist_bin_edges,
-                    y=ldens.results.y.mass_density,
-                    name="Y",
-                    line={
-                        "width": 0.5,
-                        "color": "green",
-                    },
-                ),
-            )
-            fig_ldens.add_trace(
-                go.Scatter(
-                    x=ldens.results.z.hist_bin_edges,
-                    y=ldens.results.z.mass_density,
-                    name="Z",
-                    line={
-                        "width": 0.5,
-                        "color": "blue",
-                    },
-                ),
-            )
-            fig_ldens.add_trace(
-                go.Scatter(
-                    x=ldens.results.z.hist_bin_edges,
-                    y=average,
-                    name="Average",
-                    line={
-                        "width": 3,
-                        "color": "black",
-                    },
-                ),
+    # Each analysis is cached on its own, so that toggling one does not recompute the others
+    results = {}
+    for name, key in keys.items():
+        try:
+            results[name] = cached_result(key)
+        except KeyError:
+            pass
+
+    if HAS_DISKCACHE and len(results) < len(keys):
+        with diskcache.Cache(CACHE_DIR / "results") as cache:
+            for name, key in keys.items():
+                if name not in results and key in cache:
+                    results[name] = cached_result(key, cache[key])
+
+    missing = tuple(name for name in enabled if name not in results)
+    if missing:
+        with st.spinner("Computing…"):
+            computed = run_analyses(
+                topo_path, xyz_path, pbc_path, resname, in_memory, missing
             )
-            st.plotly_chart(fig_ldens, use_container_width=True)
 
-    with tab3:
+        for name, result in computed.items():
+            results[name] = cached_result(keys[name], result)
+
+        if HAS_DISKCACHE:
+            with diskcache.Cache(CACHE_DIR / "results") as cache:
+                for name, result in computed.items():
+                    cache[keys[name]] = result
+
+    return results
+
+
+@st.cache_data(show_spinner=False)
+def fit_msd(start_index, end_index, timestep, dim_fac, msd_hash, _msd):
 
-        # Mean Squared Displacement (MSD)
+    # The MSD array itself is not hashed on every slider move, msd_hash stands for it
+    lagtimes = np.arange(len(_msd)) * timestep
 
-        u = create_u()
+    linear_model = linregress(lagtimes[start_index:end_index], _msd[start_index:end_index])
+    slope = linear_model.slope
+    # dim_fac is 3 as we computed a 3D msd with 'xyz'
+    D = slope * 1 / (2 * dim_fac)
 
-        import MDAnalysis.analysis.msd as msd
+    return slope, linear_model.rvalue, D
 
-        MSD = msd.EinsteinMSD(u, select="all", msd_type="xyz", fft=True)
 
-        if "MSD" not in st.session_state:
-            st.session_state["MSD"] = MSD.run()
-        if st.button("Calculate MSD"):
-            st.session_state["MSD"] = MSD.run()
-        MSD = st.session_state["MSD"]
+def _downsample(x, y, n=2000):
+    """Picks at most n evenly spaced points of a trace, enough for the screen resolution"""
 
-        msd = MSD.results.timeseries
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= n:
+        return x, y
+
+    idx = np.linspace(0, len(x) - 1, n).astype(int)
+    return x[idx], y[idx]
+
+
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    [
+        "O-O RDF",
+        "Linear Density",
+        "Self-Diffusivity",
+        "Dielectric Constant",
+        "Solute-solvent RDF",
+    ]
+)
+
+with tab1:
+    rdf_OO_check = st.checkbox("Calculate O-O RDF")
+with tab2:
+    ldens_check = st.checkbox("Calculate Linear Density")
+with tab3:
+    msd_check = st.checkbox("Calculate MSD", value=True)
+with tab4:
+    diel_check = st.checkbox("Calculate Dielectric Constant")
+with tab5:
+    rdf_solute_solvent_check = st.checkbox("Calculate solute-solvent RDF")
+
+enabled = tuple(
+    name
+    for name, check in [
+        ("rdf_OO", rdf_OO_check),
+        ("ldens", ldens_check),
+        ("msd", msd_check),
+        ("diel", diel_check),
+        ("rdf_solute_solvent", rdf_solute_solvent_check),
+    ]
+    if check
+)
+
+results = compute_analyses(topo_path, xyz_path, pbc_path, ss.resname, in_memory, enabled)
+
+with tab1:
+
+    # O-O Radial Distribution Function (RDF)
+
+    if rdf_OO_check:
+
+        bins, rdf = results["rdf_OO"]
+
+        fig_rdf = go.Figure()
+
+        exp_path = f"{os.path.dirname(__file__)}/../data/RDF_OO_exp.csv"
+
+        exp = pd.read_csv(exp_path)
+
+        x, y = _downsample(exp["r (Å)"], exp["g_OO"])
+        fig_rdf.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Experimental",
+            ),
+        )
+
+        x, y = _downsample(bins, rdf)
+        fig_rdf.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Calculated",
+            ),
+        )
+
+        fig_rdf.update_xaxes(title_text="r (Å)")
+        fig_rdf.update_yaxes(title_text="g(r) O-O")
+
+        st.plotly_chart(fig_rdf, use_container_width=True)
+
+with tab2:
+
+    # Linear Density
+
+    if ldens_check:
+
+        hist_bin_edges, mass_density_x, mass_density_y, mass_density_z = results["ldens"]
+
+        fig_ldens = go.Figure()
+        average = np.empty_like(mass_density_x)
+        np.add(mass_density_x, mass_density_y, out=average)
+        np.add(average, mass_density_z, out=average)
+        np.multiply(average, 1 / 3, out=average)
+
+        x, y = _downsample(hist_bin_edges[:-1], mass_density_x)
+        fig_ldens.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="X",
+                line={
+                    "width": 0.5,
+                    "color": "red",
+                },
+            ),
+        )
+        x, y = _downsample(hist_bin_edges[:-1], mass_density_y)
+        fig_ldens.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Y",
+                line={
+                    "width": 0.5,
+                    "color": "green",
+                },
+            ),
+        )
+        x, y = _downsample(hist_bin_edges[:-1], mass_density_z)
+        fig_ldens.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Z",
+                line={
+                    "width": 0.5,
+                    "color": "blue",
+                },
+            ),
+        )
+        x, y = _downsample(hist_bin_edges[:-1], average)
+        fig_ldens.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Average",
+                line={
+                    "width": 3,
+                    "color": "black",
+                },
+            ),
+        )
+        st.plotly_chart(fig_ldens, use_container_width=True)
+
+with tab3:
+
+    # Mean Squared Displacement (MSD)
+
+    if msd_check:
+
+        msd_ts, nframes, dim_fac, msd_hash = results["msd"]
 
-        nframes = MSD.n_frames
         timestep = 100  # this needs to be the actual time between frames
         st.write(f"Calculating MSD with a timestep of {timestep} fs")
         lagtimes = np.arange(nframes) * timestep  # make the lag-time axis
 
         fig_msd = make_subplots(specs=[[{"secondary_y": True}]])
 
+        x, y = _downsample(lagtimes, msd_ts)
         fig_msd.add_trace(
             go.Scatter(
-                x=lagtimes,
-                y=msd,
+                x=x,
+                y=y,
                 name="MSD",
             ),
         )
 
         # Calculating self-diffusivity
 
-        from scipy.stats import linregress
-
         start_time, end_time = st.slider(
             label="Select start and end time (ps):",
             min_value=int(lagtimes[0]),
@@ -242,8 +595,8 @@ with tmp(mode="w+") as topo_tmp, tmp(mode="w+") as xyz_tmp:
 
         fig_msd.add_trace(
             go.Scatter(
-                x=np.arange(start_time, end_time),
-                y=np.arange(start_time, end_time),
+                x=[start_time, end_time],
+                y=[start_time, end_time],
                 name="slope = 1",
                 line={
                     "dash": "dash",
@@ -257,7 +610,7 @@ with tmp(mode="w+") as topo_tmp, tmp(mode="w+") as xyz_tmp:
             # type="log",
         )
         fig_msd.update_yaxes(
-            range=[msd[start_time // timestep], msd[end_time // timestep]],
+            range=[msd_ts[start_index], msd_ts[min(end_index, len(msd_ts) - 1)]],
             title_text="MSD (Å^2 / fs)",
             # type="log",
         )
@@ -268,68 +621,42 @@ with tmp(mode="w+") as topo_tmp, tmp(mode="w+") as xyz_tmp:
             # type="log",
         )
 
-        linear_model = linregress(
-            lagtimes[start_index:end_index], msd[start_index:end_index]
+        slope, error, D = fit_msd(
+            start_index, end_index, timestep, dim_fac, msd_hash, msd_ts
         )
-        slope = linear_model.slope
-        error = linear_model.rvalue
-        # dim_fac is 3 as we computed a 3D msd with 'xyz'
-        D = slope * 1 / (2 * MSD.dim_fac)
         st.write(f"Self-diffusivity coefficient: {(D*(10**-5)):.3E} m\N{SUPERSCRIPT TWO}/s")
 
         st.plotly_chart(fig_msd, use_container_width=True)
 
-    with tab4:
-
-        # Dielectric constant
-
-        u = create_u()
+with tab4:
 
-        from MDAnalysis.analysis.dielectric import DielectricConstant
+    # Dielectric constant
 
-        diel = DielectricConstant(u.atoms, temperature=298.15, make_whole=True)
+    if diel_check:
 
-        if "diel" not in st.session_state:
-            st.session_state["diel"] = None
-        if st.button("Calculate Dielectric Constant"):
-            st.session_state["diel"] = diel.run()
-            diel = st.session_state["diel"]
-            st.write(f"Dielectric constant: {diel.results.eps_mean:.3}")
+        eps_mean = results["diel"]
+        st.write(f"Dielectric constant: {eps_mean:.3}")
 
-    with tab5:
+with tab5:
 
-        # Solute-solvent Radial Distribution Function (RDF)
+    # Solute-solvent Radial Distribution Function (RDF)
 
-        u = create_u()
+    if rdf_solute_solvent_check:
 
-        solute = u.select_atoms(f"resname {ss.resname}")
-        solvent = u.select_atoms(f"not resname {ss.resname}")
+        bins, rdf = results["rdf_solute_solvent"]
 
-        workflow = [
-            trans.unwrap(u.atoms),
-            trans.wrap(water, compound="residues"),
-        ]
-        u.trajectory.add_transformations(*workflow)
-
-        rdf = InterRDF(solute, solvent, nbins=500, range=[1.0, ss.box_side / 2])
-
-        if "rdf_solute_solvent" not in st.session_state:
-            st.session_state["rdf_solute_solvent"] = None
-        if st.button("Calculate solute-solvent RDF"):
-            st.session_state["rdf_solute_solvent"] = rdf.run(step=1)
-            rdf_solute_solvent = st.session_state["rdf_solute_solvent"]
-
-            fig_rdf = go.Figure()
+        fig_rdf = go.Figure()
 
-            fig_rdf.add_trace(
-                go.Scatter(
-                    x=rdf_solute_solvent.results.bins,
-                    y=rdf_solute_solvent.results.rdf,
-                    name="Solute-solvent RDF",
-                ),
-            )
+        x, y = _downsample(bins, rdf)
+        fig_rdf.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Solute-solvent RDF",
+            ),
+        )
 
-            fig_rdf.update_xaxes(title_text="r (Å)")
-            fig_rdf.update_yaxes(title_text="g(r)")
+        fig_rdf.update_xaxes(title_text="r (Å)")
+        fig_rdf.update_yaxes(title_text="g(r)")
 
-            st.plotly_chart(fig_rdf, use_container_width=True)
+        st.plotly_chart(fig_rdf, use_container_width=True)
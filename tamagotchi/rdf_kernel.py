@@ -0,0 +1,90 @@
+############################################################################################
+# # # # # # # # # # # # # # # # # #      RDF KERNEL      # # # # # # # # # # # # # # # # # #
+############################################################################################
+
+# Numba kernel computing the RDF of a group of atoms with itself (e.g. the O-O RDF of
+# water) straight from an in-memory trajectory. Set TAMAGOTCHI_RDF_BACKEND=numpy to fall
+# back to the MDAnalysis based implementation.
+
+import os
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+
+    # The TBB threads hang the processes later forked by the multiprocessing backend
+    if "NUMBA_THREADING_LAYER_PRIORITY" not in os.environ:
+        numba.config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+except ImportError:
+    HAS_NUMBA = False
+
+# Asking for the numba backend without numba installed falls back to numpy as well
+RDF_BACKEND = os.environ.get("TAMAGOTCHI_RDF_BACKEND", "numba") if HAS_NUMBA else "numpy"
+
+# Frames histogrammed at once, each one in its own row of counts
+CHUNK_SIZE = 1024
+
+
+if HAS_NUMBA:
+
+    # Compiled once and then cached on disk
+    @njit(parallel=True, fastmath=True, cache=True)
+    def accumulate(coords, box, lo, hi, inv_dr, counts):
+        """Histograms the minimum image distances of all the atom pairs of each frame"""
+
+        nbins = counts.shape[1]
+        lo2 = lo * lo
+        hi2 = hi * hi
+
+        for f in prange(coords.shape[0]):
+            lx, ly, lz = box[f, 0], box[f, 1], box[f, 2]
+            for i in range(coords.shape[1]):
+                for j in range(i + 1, coords.shape[1]):
+                    dx = coords[f, i, 0] - coords[f, j, 0]
+                    dy = coords[f, i, 1] - coords[f, j, 1]
+                    dz = coords[f, i, 2] - coords[f, j, 2]
+                    dx -= lx * np.round(dx / lx)
+                    dy -= ly * np.round(dy / ly)
+                    dz -= lz * np.round(dz / lz)
+                    d2 = dx * dx + dy * dy + dz * dz
+                    if lo2 <= d2 <= hi2:
+                        k = int((np.sqrt(d2) - lo) * inv_dr)
+                        if k == nbins:
+                            k -= 1
+                        counts[f, k] += 1
+
+
+def self_rdf(coordinates, dimensions, nbins, range):
+    """RDF of a group of atoms with itself in an orthorhombic box.
+
+    Equivalent to `InterRDF(ag, ag, nbins=nbins, range=range, exclusion_block=(1, 1))`,
+    with `coordinates` the (n_frames, n_atoms, 3) positions of the group and `dimensions`
+    the (n_frames, 6) boxes. Returns the bin centres and the RDF.
+    """
+
+    lo, hi = range
+    n_frames, n_atoms, _ = coordinates.shape
+
+    box = np.ascontiguousarray(dimensions[:, :3], dtype=np.float64)
+    edges = np.linspace(lo, hi, nbins + 1)
+
+    count = np.zeros(nbins, dtype=np.int64)
+    for start in np.arange(0, n_frames, CHUNK_SIZE):
+        chunk = np.ascontiguousarray(coordinates[start : start + CHUNK_SIZE])
+        counts = np.zeros((len(chunk), nbins), dtype=np.int64)
+        accumulate(chunk, box[start : start + CHUNK_SIZE], lo, hi, nbins / (hi - lo), counts)
+        count += counts.sum(axis=0)
+
+    # Each pair is found once, InterRDF counts it in both orders
+    count *= 2
+
+    # Same normalization of InterRDF with norm="rdf"
+    N = n_atoms * n_atoms - n_atoms
+    box_vol = np.prod(box, axis=1).mean()
+    norm = n_frames * 4 / 3 * np.pi * np.diff(np.power(edges, 3)) * N / box_vol
+
+    return 0.5 * (edges[:-1] + edges[1:]), count / norm
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import MDAnalysis as mda
+import numpy as np
+import pytest
+
+# The modules are imported the same way the Streamlit pages do
+sys.path.insert(0, str(Path(__file__).parents[1] / "tamagotchi"))
+
+BOX_SIDE = 12.4
+
+
+def water_coordinates(n_waters, n_frames, seed):
+    """Unwrapped coordinates of rigid-ish waters diffusing in the box"""
+
+    rng = np.random.default_rng(seed)
+
+    oxygens = rng.uniform(0, BOX_SIDE, (n_waters, 3))
+    oxygens = oxygens + np.cumsum(rng.normal(0, 0.3, (n_frames, n_waters, 3)), axis=0)
+
+    hydrogens = rng.normal(0, 1, (n_frames, n_waters, 2, 3))
+    hydrogens *= 0.96 / np.linalg.norm(hydrogens, axis=-1, keepdims=True)
+
+    coordinates = np.concatenate(
+        [oxygens[:, :, np.newaxis], oxygens[:, :, np.newaxis] + hydrogens], axis=2
+    )
+    return coordinates.reshape(n_frames, 3 * n_waters, 3).astype(np.float32)
+
+
+def water_universe(coordinates):
+
+    n_atoms = coordinates.shape[1]
+    n_waters = n_atoms // 3
+
+    u = mda.Universe.empty(
+        n_atoms,
+        n_residues=n_waters,
+        atom_resindex=np.repeat(np.arange(n_waters), 3),
+        trajectory=True,
+    )
+    u.add_TopologyAttr("name", ["O", "H", "H"] * n_waters)
+    u.add_TopologyAttr("resname", ["SOL"] * n_waters)
+    u.add_TopologyAttr("masses", [15.999, 1.008, 1.008] * n_waters)
+    u.add_TopologyAttr("charges", [-0.834, 0.417, 0.417] * n_waters)
+    u.add_TopologyAttr(
+        "bonds", [(3 * i, 3 * i + j) for i in range(n_waters) for j in (1, 2)]
+    )
+
+    u.load_new(
+        coordinates.copy(), order="fac", dimensions=[BOX_SIDE] * 3 + [90, 90, 90], dt=1.0
+    )
+    return u
+
+
+@pytest.fixture
+def whole():
+    """Waters with unwrapped coordinates, molecules are whole"""
+
+    return water_universe(water_coordinates(n_waters=64, n_frames=30, seed=0))
+
+
+@pytest.fixture
+def wrapped():
+    """The same waters with every atom wrapped in the box, molecules are broken"""
+
+    coordinates = water_coordinates(n_waters=64, n_frames=30, seed=0)
+    return water_universe(coordinates - BOX_SIDE * np.floor(coordinates / BOX_SIDE))
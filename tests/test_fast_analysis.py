@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from MDAnalysis.analysis.dielectric import DielectricConstant
+from MDAnalysis.analysis.lineardensity import LinearDensity
+from MDAnalysis.analysis.msd import EinsteinMSD
+from MDAnalysis.analysis.rdf import InterRDF
+
+from fast_analysis import (
+    FastEinsteinMSD,
+    FastInterRDF,
+    FastLinearDensity,
+    dielectric_constant,
+    linear_bincount,
+    run_together,
+)
+from rdf_kernel import HAS_NUMBA, self_rdf
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_linear_bincount_matches_histogram(dtype):
+
+    rng = np.random.default_rng(0)
+    # Values on the edges and right next to them, on the range limits and outside of it are
+    # the corner cases
+    edges = np.linspace(2.0, 6.2, 501).astype(dtype)
+    values = np.concatenate(
+        [
+            rng.uniform(1.0, 7.0, 100000).astype(dtype),
+            edges,
+            np.nextafter(edges, dtype(-np.inf)),
+            np.nextafter(edges, dtype(np.inf)),
+            np.array([1.999, 6.201], dtype=dtype),
+        ]
+    )
+    weights = rng.normal(size=len(values))
+
+    expected, edges = np.histogram(values, bins=500, range=(2.0, 6.2))
+    np.testing.assert_array_equal(linear_bincount(values, edges), expected)
+
+    # Weighted sums only differ by the order of the additions
+    expected, _ = np.histogram(values, bins=500, range=(2.0, 6.2), weights=weights)
+    np.testing.assert_allclose(linear_bincount(values, edges, weights=weights), expected)
+
+
+def rdf_pair(u, cls, **kwargs):
+    oxygens = u.select_atoms("name O")
+    side = u.dimensions[0]
+    return cls(
+        oxygens, oxygens, nbins=500, range=(2.0, side / 2), exclusion_block=(1, 1), **kwargs
+    )
+
+
+def test_fast_interrdf_bruteforce_matches_interrdf(wrapped):
+
+    expected = rdf_pair(wrapped, InterRDF).run()
+    result = rdf_pair(wrapped, FastInterRDF, method="bruteforce").run()
+
+    np.testing.assert_array_equal(result.results.count, expected.results.count)
+    np.testing.assert_allclose(result.results.rdf, expected.results.rdf)
+    np.testing.assert_array_equal(result.results.bins, expected.results.bins)
+
+
+def test_fast_interrdf_nsgrid_matches_interrdf(wrapped):
+
+    expected = rdf_pair(wrapped, InterRDF).run()
+    result = rdf_pair(wrapped, FastInterRDF).run()
+
+    # The grid search works in single precision: a few distances close to a bin edge can
+    # land in the neighbouring bin
+    shifted = np.abs(result.results.count - expected.results.count).sum()
+    assert shifted <= 1e-3 * expected.results.count.sum()
+    assert abs(result.results.count.sum() - expected.results.count.sum()) <= 2
+
+
+def test_fast_interrdf_parallel_bins(wrapped):
+
+    if "multiprocessing" not in FastInterRDF.get_supported_backends():
+        pytest.skip("MDAnalysis without parallel backends")
+
+    expected = rdf_pair(wrapped, FastInterRDF).run()
+    result = rdf_pair(wrapped, FastInterRDF).run(backend="multiprocessing", n_workers=2)
+
+    np.testing.assert_allclose(result.results.bins, expected.results.bins)
+    np.testing.assert_allclose(result.results.rdf, expected.results.rdf)
+
+
+@pytest.mark.skipif(not HAS_NUMBA, reason="numba is not installed")
+def test_self_rdf_matches_interrdf(wrapped):
+
+    expected = rdf_pair(wrapped, InterRDF).run()
+    oxygens = wrapped.select_atoms("name O")
+    bins, rdf = self_rdf(
+        wrapped.trajectory.coordinate_array[:, oxygens.indices],
+        wrapped.trajectory.dimensions_array,
+        nbins=500,
+        range=(2.0, wrapped.dimensions[0] / 2),
+    )
+
+    np.testing.assert_allclose(bins, expected.results.bins, rtol=1e-6)
+    # Single precision edge effects as for the grid search
+    np.testing.assert_allclose(rdf.sum(), expected.results.rdf.sum(), rtol=1e-3)
+    assert np.abs(rdf - expected.results.rdf).max() < 0.05 * expected.results.rdf.max()
+
+
+def test_fast_msd_matches_einstein_msd(whole):
+
+    pytest.importorskip("tidynamics")
+
+    expected = EinsteinMSD(whole, select="all", msd_type="xyz", fft=True).run()
+    result = FastEinsteinMSD(whole, select="all", msd_type="xyz", fft=True).run()
+
+    np.testing.assert_allclose(
+        result.results.timeseries,
+        expected.results.timeseries,
+        rtol=1e-4,
+        atol=1e-4 * expected.results.timeseries.max(),
+    )
+
+
+def test_fast_linear_density_matches_linear_density(wrapped):
+
+    expected = LinearDensity(wrapped.atoms, binsize=0.1).run()
+    result = FastLinearDensity(wrapped.atoms, binsize=0.1).run()
+
+    for dim in ["x", "y", "z"]:
+        for key in [
+            "mass_density",
+            "mass_density_stddev",
+            "charge_density",
+            "charge_density_stddev",
+            "hist_bin_edges",
+        ]:
+            np.testing.assert_array_equal(
+                result.results[dim][key], expected.results[dim][key]
+            )
+
+
+def test_dielectric_constant_matches_dielectric(whole, wrapped):
+
+    expected = DielectricConstant(wrapped.atoms, temperature=298.15, make_whole=True).run()
+    result = dielectric_constant(
+        whole.atoms,
+        whole.trajectory.coordinate_array,
+        whole.trajectory.dimensions_array,
+        temperature=298.15,
+    )
+
+    np.testing.assert_allclose(result, expected.results.eps_mean, rtol=1e-5)
+
+
+def test_dielectric_constant_refuses_charged_fragments(whole):
+
+    whole.atoms[0].charge += 1.0
+
+    with pytest.raises(NotImplementedError):
+        dielectric_constant(
+            whole.atoms,
+            whole.trajectory.coordinate_array,
+            whole.trajectory.dimensions_array,
+            temperature=298.15,
+        )
+
+
+def test_run_together_matches_separate_runs(wrapped):
+
+    # Both analyses move the atoms in place, which must not leak into the other one nor
+    # into the trajectory
+    positions = wrapped.trajectory.coordinate_array.copy()
+    together = run_together(
+        [
+            FastLinearDensity(wrapped.atoms, binsize=0.1),
+            DielectricConstant(wrapped.atoms, temperature=298.15, make_whole=True),
+        ]
+    )
+    np.testing.assert_array_equal(wrapped.trajectory.coordinate_array, positions)
+
+    ldens = FastLinearDensity(wrapped.atoms, binsize=0.1).run()
+    diel = DielectricConstant(wrapped.atoms, temperature=298.15, make_whole=True).run()
+
+    np.testing.assert_array_equal(
+        together[0].results.x.mass_density, ldens.results.x.mass_density
+    )
+    np.testing.assert_allclose(together[1].results.eps_mean, diel.results.eps_mean)